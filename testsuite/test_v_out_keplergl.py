@@ -16,6 +16,8 @@ for details.
 
 import os
 
+import grass.script as gs
+
 from grass.gunittest.case import TestCase
 from grass.gunittest.main import test
 
@@ -27,6 +29,8 @@ class TestWatershed(TestCase):
     test_input_1 = "geology"
     # Filename used as output
     output = "output.html"
+    # Filename used as a style file when one is needed
+    style_file = "style.json"
 
     @classmethod
     def setUpClass(cls):
@@ -56,6 +60,8 @@ class TestWatershed(TestCase):
         """
         if os.path.isfile(self.output):
             os.remove(self.output)
+        if os.path.isfile(self.style_file):
+            os.remove(self.style_file)
 
     def test_output_created(self):
         """Check that the output is created"""
@@ -68,6 +74,42 @@ class TestWatershed(TestCase):
         # check to see if output is in mapset
         self.assertFileExists(self.output, msg="Output was not created")
 
+    def test_columns_pruning(self):
+        """Check the module with a column subset and cleanup of its temporary map
+
+        The color column is intentionally not in the columns list, so the
+        pruning must keep it because it is used by a visual channel.
+        """
+        with open(self.style_file, "w") as file:
+            file.write('{"opacity": 0.5}')
+        self.assertModule(
+            "v.out.keplergl",
+            input=self.test_input_1,
+            output=self.output,
+            columns="GEO_NAME",
+            color_column="GEOL250_ID",
+            style=self.style_file,
+        )
+        self.assertFileExists(self.output, msg="Output was not created")
+        with open(self.output, encoding="utf-8") as file:
+            html = file.read()
+        self.assertIn(
+            "GEO_NAME", html, msg="Column from the columns option was not exported"
+        )
+        self.assertIn(
+            "GEOL250_ID", html, msg="Column used for a visual channel was pruned"
+        )
+        self.assertNotIn(
+            "PERIMETER", html, msg="Unused column was not pruned from the export"
+        )
+        leftovers = gs.read_command(
+            "g.list", type="vector", pattern="tmp_v_out_keplergl_*"
+        ).strip()
+        self.assertFalse(
+            leftovers,
+            msg=f"Temporary vector <{leftovers}> was not removed",
+        )
+
     def test_missing_parameter(self):
         """Check that the module fails when parameters are missing"""
         self.assertModuleFail(
@@ -72,10 +72,21 @@ This executable script is a GRASS GIS module to run in a GRASS GIS session.
 #% requires: height_column, style
 #%end
 
+import atexit
+import collections
+import copy
+import functools
+import io
 import os
 import sys
 import json
 
+try:
+    # Optional faster JSON encoder and decoder.
+    import orjson
+except ImportError:
+    orjson = None
+
 import grass.script as gs
 
 try:
@@ -97,6 +108,70 @@ except ImportError:
         return sql_type.upper() in _SQL_FLOAT_TYPES
 
 
+# Translation table turning a (fully qualified) map name into a data id.
+# Extend the dict when more substitutions are needed instead of
+# chaining str.replace calls.
+_DATA_ID_TABLE = str.maketrans({"@": "__at__"})
+
+
+def write_json(data, stream):
+    """Write data as compact JSON to a file-like stream
+
+    With orjson the serialization happens in one shot; with the
+    standard json the output is encoded and written chunk by chunk,
+    so one big intermediate string is never materialized.
+    """
+    if orjson:
+        stream.write(orjson.dumps(data).decode("utf-8"))
+    else:
+        stream.writelines(json.JSONEncoder(separators=(",", ":")).iterencode(data))
+
+
+def json_loads(data):
+    """Parse JSON from a str or bytes object
+
+    Uses orjson when available and falls back to the standard json.
+    """
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Module object (or False when not installed) memoized by _get_geopandas().
+_GEOPANDAS = None
+
+
+def _get_geopandas():
+    """Lazy import geopandas once, returning None when it is not installed"""
+    # We don't want to depend on the package when we don't need it.
+    # pylint: disable=import-outside-toplevel
+    global _GEOPANDAS  # pylint: disable=global-statement
+    if _GEOPANDAS is None:
+        try:
+            import geopandas
+
+            _GEOPANDAS = geopandas
+        except ImportError:
+            _GEOPANDAS = False
+    return _GEOPANDAS or None
+
+
+# Module object memoized by _get_yaml().
+_YAML = None
+
+
+def _get_yaml():
+    """Lazy import yaml once and reuse the module object afterwards"""
+    # We don't want to depend on the package when we don't need it.
+    # pylint: disable=import-outside-toplevel
+    global _YAML  # pylint: disable=global-statement
+    if _YAML is None:
+        import yaml
+
+        _YAML = yaml
+    return _YAML
+
+
 def load_key_value_file(filename):
     """Load nested dict structure from a file.
 
@@ -105,17 +180,34 @@ def load_key_value_file(filename):
     Extension for Python literals is `.py`, `.dict`, and `.pydict`.
 
     This function lazy imports all non-standard dependencies.
+
+    Results are cached, so repeated calls for an unchanged file skip
+    the parsing. Callers should not modify the returned structure.
+    """
+    return _load_key_value_file(filename, os.stat(filename).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_key_value_file(filename, unused_mtime_ns):
+    """Parse the file (backend of load_key_value_file)
+
+    The mtime parameter is unused, but it makes the cache key so that
+    a modified file is parsed again.
     """
-    # We don't want to depend on the packages when we don't need them.
     # pylint: disable=import-outside-toplevel
     lower = filename.lower()
     if lower.endswith(".json"):
-        with open(filename) as file:
-            return json.loads(file.read())
+        # Read bytes and let the parser handle UTF-8 itself, skipping
+        # the text-mode decoding and line-ending translation.
+        with open(filename, "rb") as file:
+            return json_loads(file.read())
     elif lower.endswith(".yaml") or lower.endswith(".yml"):
-        import yaml
+        yaml = _get_yaml()
 
         with open(filename) as file:
+            if hasattr(yaml, "CSafeLoader"):
+                # The C loader is much faster than the pure Python one.
+                return yaml.load(file, Loader=yaml.CSafeLoader)
             if hasattr(yaml, "full_load"):
                 return yaml.full_load(file)
             return yaml.load(file)
@@ -127,46 +219,67 @@ def load_key_value_file(filename):
     raise ValueError(f"Unknown file extension (file: {filename})")
 
 
-def create_base_configuration():
-    """Get basic structure for configuration"""
-    return {
-        "version": "v1",
-        "config": {
-            "visState": {
-                "filters": [],
-                "layers": [],
-                "interactionConfig": {
-                    "tooltip": {"fieldsToShow": {}, "enabled": True},
-                    "brush": {"size": 0.5, "enabled": False},
-                    "geocoder": {"enabled": False},
-                    "coordinate": {"enabled": False},
-                },
-                "layerBlending": "normal",
-                "splitMaps": [],
-                "animationConfig": {"currentTime": None, "speed": 1},
+# Template for the basic configuration structure.
+# Use create_base_configuration() to get a mutable copy.
+_BASE_CONFIGURATION = {
+    "version": "v1",
+    "config": {
+        "visState": {
+            "filters": [],
+            "layers": [],
+            "interactionConfig": {
+                "tooltip": {"fieldsToShow": {}, "enabled": True},
+                "brush": {"size": 0.5, "enabled": False},
+                "geocoder": {"enabled": False},
+                "coordinate": {"enabled": False},
             },
-            "mapState": None,
-            "mapStyle": {
-                "styleType": "dark",
-                "topLayerGroups": {},
-                "visibleLayerGroups": {
-                    "label": False,
-                    "road": True,
-                    "border": False,
-                    "building": True,
-                    "water": True,
-                    "land": True,
-                    "3d building": False,
-                },
-                "threeDBuildingColor": [
-                    9.665468314072013,
-                    17.18305478057247,
-                    31.1442867897876,
-                ],
-                "mapStyles": {},
+            "layerBlending": "normal",
+            "splitMaps": [],
+            "animationConfig": {"currentTime": None, "speed": 1},
+        },
+        "mapState": None,
+        "mapStyle": {
+            "styleType": "dark",
+            "topLayerGroups": {},
+            "visibleLayerGroups": {
+                "label": False,
+                "road": True,
+                "border": False,
+                "building": True,
+                "water": True,
+                "land": True,
+                "3d building": False,
             },
+            "threeDBuildingColor": [
+                9.665468314072013,
+                17.18305478057247,
+                31.1442867897876,
+            ],
+            "mapStyles": {},
         },
-    }
+    },
+}
+
+
+# References into the parts of a configuration which get modified,
+# saving the chained dict lookups at the places doing the modification.
+ConfigHandles = collections.namedtuple("ConfigHandles", ["layers", "fields_to_show"])
+
+
+def create_base_configuration():
+    """Get basic structure for configuration
+
+    Returns a deep copy of the module-level template, so callers can
+    modify the result freely, together with ConfigHandles pointing
+    into the copy.
+    """
+    config = copy.deepcopy(_BASE_CONFIGURATION)
+    vis_state = config["config"]["visState"]
+    handles = ConfigHandles(
+        layers=vis_state["layers"],
+        fields_to_show=vis_state["interactionConfig"]["tooltip"]["fieldsToShow"],
+    )
+    return config, handles
 
 
 def load_style_from_file(filename):
@@ -194,8 +307,12 @@ def load_style_from_file(filename):
     return style
 
 
-def add_layer(config, data_id, label, visual_channels, style_file):
-    """Add layer to configuration
+def add_layer(handles, data_id, label, visual_channels, style_file, geojson_column):
+    """Add layer to configuration through its ConfigHandles
+
+    The geojson_column parameter is the name of the dataset field
+    holding the geometry, which depends on how the data is passed to
+    Kepler.gl (see write_html()).
 
     Currently, only one layer is possible since id is hardcoded.
     """
@@ -211,7 +328,7 @@ def add_layer(config, data_id, label, visual_channels, style_file):
             "dataId": data_id,
             "label": label,
             "color": [136, 87, 44],
-            "columns": {"geojson": "_geojson"},
+            "columns": {"geojson": geojson_column},
             "isVisible": True,
             "visConfig": {},
             "hidden": False,
@@ -232,7 +349,7 @@ def add_layer(config, data_id, label, visual_channels, style_file):
         # Assuming only one layer here.
         layer["config"]["visConfig"][key] = value
 
-    config["config"]["visState"]["layers"].append(layer)
+    handles.layers.append(layer)
 
 
 def create_visual_channels(color_column, stroke_color_column, height_column):
@@ -240,49 +357,63 @@ def create_visual_channels(color_column, stroke_color_column, height_column):
 
     Parameters set to None are not included.
     """
-    visual_channels = {
-        "colorField": None,
-        "colorScale": "quantize",
+    # A single dict literal lets CPython size the hash table for the
+    # exact number of keys instead of growing it item by item.
+    # TODO: More complicated system than one fixed property is needed
+    # for height, radius and size. Maybe just size and color scale properties.
+    return {
+        "colorField": (
+            {"name": color_column.name, "type": color_column.kepler_type}
+            if color_column
+            else None
+        ),
+        "colorScale": color_column.kepler_scale if color_column else "quantize",
         "sizeField": None,
         "sizeScale": "linear",
-        "strokeColorField": None,
-        "strokeColorScale": "quantize",
-        "heightField": None,
+        "strokeColorField": (
+            {
+                "name": stroke_color_column.name,
+                "type": stroke_color_column.kepler_type,
+            }
+            if stroke_color_column
+            else None
+        ),
+        "strokeColorScale": (
+            stroke_color_column.kepler_scale if stroke_color_column else "quantize"
+        ),
+        "heightField": (
+            {"name": height_column.name, "type": height_column.kepler_type}
+            if height_column
+            else None
+        ),
         "heightScale": "linear",
         "radiusField": None,
         "radiusScale": "linear",
     }
-    if color_column:
-        visual_channels["colorField"] = {
-            "name": color_column.name,
-            "type": color_column.kepler_type,
-        }
-        visual_channels["colorScale"] = color_column.kepler_scale
-    if stroke_color_column:
-        visual_channels["strokeColorField"] = {
-            "name": stroke_color_column.name,
-            "type": stroke_color_column.kepler_type,
-        }
-        visual_channels["strokeColorScale"] = stroke_color_column.kepler_scale
-    if height_column:
-        visual_channels["heightField"] = {
-            "name": height_column.name,
-            "type": height_column.kepler_type,
-        }
-        # TODO: More complicated system than one fixed property is needed
-        # for height, radius and size. Maybe just size and color scale properties.
-    return visual_channels
-
-
-def add_map_state(config, zoom):
+
+
+def get_region_center():
+    """Get center of the computational region as (longitude, latitude)"""
+    # Parse only the two keys we need instead of building a full dict
+    # with parse_command.
+    longitude = latitude = None
+    for line in gs.read_command("g.region", flags="cg").splitlines():
+        key, unused_separator, value = line.partition("=")
+        if key == "center_easting":
+            longitude = float(value)
+        elif key == "center_northing":
+            latitude = float(value)
+    return longitude, latitude
+
+
+def add_map_state(config, zoom, longitude, latitude):
     """Add map state to the configuration.
 
-    Center of the map is determined from the region, zoom from the parameter.
+    Center of the map is taken from the longitude and latitude
+    parameters, zoom from the zoom parameter. Taking plain scalars
+    keeps this function free of subprocess calls, so future batch
+    export can compute many centers at once and just loop here.
     """
-    center = gs.parse_command("g.region", flags="cg")
-    longitude = float(center["center_easting"])
-    latitude = float(center["center_northing"])
-
     map_state = {
         "bearing": 0,
         "dragRotate": False,
@@ -295,38 +426,115 @@ def add_map_state(config, zoom):
     config["config"]["mapState"] = map_state
 
 
-def write_html(geojson_file, data_id, output_html, config, title):
-    """Write Kepler.gl HTML and update its content"""
+def export_geojson(vector_input):
+    """Export the vector map as newline-delimited GeoJSON bytes
+
+    Streams v.out.ogr output through a pipe using GDAL's /vsistdout/
+    virtual file system, so the features never touch the disk. Falls
+    back to a temporary file when streaming does not work (e.g., GDAL
+    without /vsistdout/ support).
+    """
+    process = gs.pipe_command(
+        "v.out.ogr",
+        input=vector_input,
+        output="/vsistdout/",
+        format="GeoJSONSeq",
+        flags="s",
+        quiet=True,
+    )
+    data, unused_errors = process.communicate()
+    if process.returncode == 0:
+        # A clean exit is a success even when the payload is empty
+        # (a legitimately empty vector map).
+        return data
+    # A warning so the notice is visible whenever the error output of
+    # the failed pipe attempt is.
+    gs.warning(
+        _(
+            "Streaming the v.out.ogr output through a pipe failed,"
+            " retrying with a temporary file"
+        )
+    )
+
+    # TODO: Isn't system tmp file more appropriate?
+    # or file in the already existing session tmp dir in system
+    # This file is not cleaned up by the module (but only with session cleanups).
+    geojson_file = gs.tempfile(create=False)
+    gs.run_command(
+        "v.out.ogr",
+        input=vector_input,
+        output=geojson_file,
+        format="GeoJSONSeq",
+        flags="s",
+        quiet=True,
+    )
+    with open(geojson_file, "rb") as file:
+        return file.read()
+
+
+def write_html(geojson_data, data_id, output_html, config, title):
+    """Write Kepler.gl HTML and update its content
+
+    The geojson_data parameter is the raw bytes of a newline-delimited
+    GeoJSON export as produced by export_geojson().
+    """
     # Lazy load non-standard dependencies to play nicely in cases
     # when only interface description is requested and the module
     # actually does not run.
     try:
         # pylint: disable=import-outside-toplevel
         from keplergl import KeplerGl
-        from in_place import InPlace
     except ImportError as error:
         gs.fatal(
-            _("Missing mandatory keplergl or in_place dependencies: {error}").format(
-                error=error
-            )
+            _("Missing mandatory keplergl dependency: {error}").format(error=error)
         )
 
     # Useful to examine the resulting configuration
-    # print("Using configuration (JSON syntax):")
-    # print(json.dumps(config, indent=2))
+    if gs.verbosity() >= 3:
+        sys.stdout.write("Using configuration (JSON syntax):\n")
+        write_json(config, sys.stdout)
+        sys.stdout.write("\n")
+    geopandas = _get_geopandas()
+
     kepler = KeplerGl(config=config)
-    kepler.add_data(data=open(geojson_file).read(), name=data_id)
+    if geopandas and geojson_data.strip():
+        # An empty export (a legitimately empty vector map) is kept on
+        # the string path below, since GDAL cannot open an empty
+        # in-memory file.
+        # Pass the data by reference as a GeoDataFrame. Kepler.gl
+        # consumes its columnar layout directly, so the payload never
+        # exists as one big JSON string on the Python side.
+        # The driver is forced because the in-memory file has no
+        # extension and driver sniffing of newline-delimited features
+        # without RS markers is unreliable (the plain GeoJSON driver
+        # would keep only the first feature).
+        data = geopandas.read_file(io.BytesIO(geojson_data), driver="GeoJSONSeq")
+    else:
+        # The export is newline-delimited GeoJSON features (RFC 8142),
+        # so we assemble the FeatureCollection wrapper Kepler.gl expects
+        # while going through the export feature by feature.
+        features = []
+        for line in geojson_data.splitlines():
+            # Tolerate blank lines and the optional RS separator.
+            line = line.strip(b"\x1e \t\r")
+            if line:
+                features.append(line.decode("utf-8"))
+        data = '{"type":"FeatureCollection","features":[' + ",".join(features) + "]}"
+    kepler.add_data(data=data, name=data_id)
     kepler.save_to_html(file_name=output_html)
 
-    # Add map title and creator
-    with InPlace(output_html) as file:
-        for line in file:
-            line = line.replace(
-                "<title>Kepler.gl</title>",
-                f"<title>{title} &ndash; GRASS GIS Kepler.gl</title>",
-            )
-            line = line.replace("Kepler.gl Jupyter", title)
-            file.write(line)
+    # Add map title and creator. This works on bytes, so the embedded
+    # data blob which dominates the file is never run through a codec.
+    with open(output_html, "rb") as file:
+        data = file.read()
+    data = data.replace(
+        b"<title>Kepler.gl</title>",
+        f"<title>{title} &ndash; GRASS GIS Kepler.gl</title>".encode("utf-8"),
+        1,
+    )
+    data = data.replace(b"Kepler.gl Jupyter", title.encode("utf-8"))
+    with open(output_html, "wb") as file:
+        file.write(data)
 
 
 class Column:
@@ -391,6 +599,43 @@ def check_columns(column_names, column_infos, vector_name, layer):
             )
 
 
+def prune_columns(vector_input, layer, keep_columns, column_infos):
+    """Create a temporary vector with only the requested attribute columns
+
+    GDAL's GeoJSON driver cannot drop fields, so a thinned copy of the
+    vector is created with g.copy and v.db.dropcolumn before the export.
+    The table key column is always kept.
+
+    Returns the name of the temporary vector or None when there is
+    nothing to drop. The caller is responsible for removing the
+    temporary vector (see remove_vector()).
+    """
+    try:
+        key_column = gs.vector_db(vector_input)[layer]["key"]
+    except KeyError:
+        key_column = "cat"
+    keep = set(keep_columns)
+    keep.add(key_column)
+    drop = [name for name in column_infos if name not in keep]
+    if not drop:
+        return None
+    temp_vector = f"tmp_v_out_keplergl_{os.getpid()}"
+    # Overwrite in case a crashed run left a map behind under a
+    # recycled PID.
+    gs.run_command(
+        "g.copy", vector=(vector_input, temp_vector), overwrite=True, quiet=True
+    )
+    gs.run_command(
+        "v.db.dropcolumn", map=temp_vector, layer=layer, columns=drop, quiet=True
+    )
+    return temp_vector
+
+
+def remove_vector(name):
+    """Remove a vector map (for cleanup of temporary maps)"""
+    gs.run_command("g.remove", type="vector", name=name, flags="f", quiet=True)
+
+
 def main():
     """Processes command line and directs the creation of the visualization"""
     options, unused_flags = gs.parser()
@@ -398,7 +643,7 @@ def main():
     output_html = options["output"]
     title = options["title"]
 
-    data_id = vector_input.replace("@", "__at__")
+    data_id = vector_input.translate(_DATA_ID_TABLE)
 
     # TODO: since we are specifying vector columns, we need to specify layer.
     layer = 1
@@ -428,42 +673,57 @@ def main():
         # TODO: Use map title if present, and only then map name as a default/fallback.
         data_label = vector_input
 
-    config = create_base_configuration()
+    config, handles = create_base_configuration()
     visual_channels = create_visual_channels(
         color_column=Column(options["color_column"], column_infos),
         stroke_color_column=Column(options["stroke_color_column"], column_infos),
         height_column=Column(options["height_column"], column_infos),
     )
+    # keplergl serializes a GeoDataFrame with its geometry as a WKT
+    # string column named geometry, while data passed as a GeoJSON
+    # string keeps the features in the _geojson field. The layer
+    # configuration needs to point at the field which will exist.
+    if _get_geopandas():
+        geojson_column = "geometry"
+    else:
+        geojson_column = "_geojson"
     add_layer(
-        config,
+        handles,
         data_id=data_id,
         label=data_label,
         visual_channels=visual_channels,
         style_file=options["style"],
+        geojson_column=geojson_column,
     )
 
-    # Maybe move to add_columns_to_show(config,... function.
-    config["config"]["visState"]["interactionConfig"]["tooltip"]["fieldsToShow"][
-        data_id
-    ] = show_columns
-
-    add_map_state(config, zoom=options["zoom"])
+    # Maybe move to add_columns_to_show(handles,... function.
+    handles.fields_to_show[data_id] = show_columns
+
+    longitude, latitude = get_region_center()
+    add_map_state(config, zoom=options["zoom"], longitude=longitude, latitude=latitude)
+
+    export_vector = vector_input
+    if show_columns:
+        # Export only the columns which are actually used, so unused
+        # attributes don't inflate the GeoJSON payload.
+        keep_columns = show_columns + [
+            name
+            for name in (
+                options["color_column"],
+                options["stroke_color_column"],
+                options["height_column"],
+            )
+            if name
+        ]
+        temp_vector = prune_columns(vector_input, layer, keep_columns, column_infos)
+        if temp_vector:
+            atexit.register(remove_vector, temp_vector)
+            export_vector = temp_vector
 
-    # TODO: Isn't system tmp file more appropriate?
-    # or file in the already existing session tmp dir in system
-    # This file is not cleaned up by the module (but only with session cleanups).
-    geojson_file = gs.tempfile(create=False)
-    gs.run_command(
-        "v.out.ogr",
-        input=vector_input,
-        output=geojson_file,
-        format="GeoJSON",
-        flags="s",
-        quiet=True,
-    )
+    geojson_data = export_geojson(export_vector)
 
     write_html(
-        geojson_file=geojson_file,
+        geojson_data=geojson_data,
         data_id=data_id,
         output_html=output_html,
         config=config,